@@ -0,0 +1,168 @@
+"""
+Buffered JSON Lines Output for Pathway
+Writes Pathway table changes as JSON lines through a byte buffer
+"""
+
+import os
+import threading
+import time
+import orjson
+import pathway as pw
+from typing import Dict, Any, Optional
+
+# JSONLINES_WRITER=pathway switches back to Pathway's own pw.io.jsonlines.write
+# (e.g. to compare output); the default is the buffered orjson writer
+USE_PATHWAY_WRITER = os.getenv('JSONLINES_WRITER', 'buffered').lower() == 'pathway'
+
+# Output files are rotated to <path>.old once they would grow past this
+# (JSONLINES_MAX_MB, 0 disables rotation)
+MAX_FILE_SIZE = int(os.getenv('JSONLINES_MAX_MB', '64')) << 20
+
+
+def _worker_threads() -> int:
+    """Number of Pathway worker threads, each of which calls on_end once"""
+    return max(1, int(os.getenv('PATHWAY_THREADS', '1')))
+
+
+class BufferedJsonLinesWriter:
+    """
+    Pathway subscriber that appends every change of a table to a JSON lines file.
+
+    Produces the same lines as pw.io.jsonlines.write (row fields plus "diff"
+    and "time"), but serializes with orjson straight into one byte buffer
+    and writes it with a single os.write() per batch instead of a Python
+    write call per line.
+
+    The buffer is flushed when a new engine time starts (the previous batch
+    is complete), when it grows past BUFFER_SIZE, every flush_interval
+    seconds (unless flush_interval is 0), and when the stream ends.
+
+    With PATHWAY_THREADS > 1 every worker thread delivers its share of the
+    changes and calls on_end once; all of it goes through one lock, and the
+    file is closed only after the last worker's on_end.
+
+    Before a flush would take the file past max_size, the file is renamed
+    to <path>.old (replacing the previous one) and a fresh file is started,
+    so a long run keeps at most two bounded files per output. A reader
+    tells the new file by its inode and finishes the unread tail of the
+    .old one first (see read_delta in websocket_server.py).
+    """
+
+    # Bytes buffered before a flush is forced mid-batch
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, path: str, flush_interval: float = 0.5, max_size: int = MAX_FILE_SIZE):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        self._size = 0
+        self._buffer = bytearray()
+        self._last_time: Optional[int] = None
+        # on_change runs on the engine's worker threads, the periodic flush
+        # on its own
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._ends_pending: Optional[int] = None
+        self._closed = False
+
+    def on_change(self, key, row: Dict[str, Any], time: int, is_addition: bool):
+        """Buffer one change (pw.io.subscribe callback)"""
+        line = orjson.dumps(
+            {**row, "diff": 1 if is_addition else -1, "time": time},
+            default=str,
+            option=orjson.OPT_APPEND_NEWLINE
+        )
+
+        with self._lock:
+            if time != self._last_time:
+                self._flush_locked()
+                self._last_time = time
+            self._buffer += line
+            if len(self._buffer) >= self.BUFFER_SIZE:
+                self._flush_locked()
+
+            if self._flusher is None and self.flush_interval:
+                self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+                self._flusher.start()
+
+    def on_end(self):
+        """
+        Flush what is left and close the file (pw.io.subscribe callback).
+
+        Called once per worker thread: every call flushes, the last one
+        closes the file, and calls after that do nothing.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            if self._ends_pending is None:
+                self._ends_pending = _worker_threads()
+            self._ends_pending -= 1
+            self._flush_locked()
+            if self._ends_pending > 0:
+                return
+            self._closed = True
+            os.close(self._fd)
+
+    def flush(self):
+        """Write all buffered lines to the file"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        """Write the buffer out with as few os.write calls as possible (lock held)"""
+        if not self._buffer or self._closed:
+            return
+
+        # Rotate between writes, so no line is split across the two files
+        if self.max_size and self._size and self._size + len(self._buffer) > self.max_size:
+            self._rotate_locked()
+
+        view = memoryview(self._buffer)
+        written = 0
+        while written < len(view):
+            written += os.write(self._fd, view[written:])
+        view.release()
+        self._size += written
+        self._buffer.clear()
+
+    def _rotate_locked(self):
+        """Move the full file to <path>.old and start an empty one (lock held)"""
+        os.close(self._fd)
+        os.replace(self.path, self.path + '.old')
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        self._size = 0
+
+    def _flush_periodically(self):
+        """Bound how long a finished batch can sit in the buffer"""
+        while not self._closed:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+def write_jsonlines(table: pw.Table, path: str, flush_interval: float = 0.5,
+                    max_size: int = MAX_FILE_SIZE) -> Optional[BufferedJsonLinesWriter]:
+    """
+    Write a Pathway table to a JSON lines file through a BufferedJsonLinesWriter.
+
+    Drop-in replacement for pw.io.jsonlines.write(table, path), which is
+    used instead when USE_PATHWAY_WRITER is set.
+
+    Args:
+        table: Table to write
+        path: Output file (truncated first)
+        flush_interval: Max seconds a completed batch stays buffered (0: no
+            periodic flush, only at batch boundaries and the end)
+        max_size: Rotate the file once it would grow past this many bytes
+
+    Returns:
+        The writer subscribed to the table (None with USE_PATHWAY_WRITER)
+    """
+    if USE_PATHWAY_WRITER:
+        pw.io.jsonlines.write(table, path)
+        return None
+
+    writer = BufferedJsonLinesWriter(path, flush_interval, max_size)
+    pw.io.subscribe(table, on_change=writer.on_change, on_end=writer.on_end)
+    return writer
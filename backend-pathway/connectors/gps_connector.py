@@ -4,12 +4,19 @@ Simulates real-time truck GPS updates by emitting position data every second
 """
 
 import pathway as pw
+import asyncio
 import time
-import json
+import orjson
 import math
-from datetime import datetime
+import logging
+import numpy as np
 from typing import List, Dict
 
+# Per-truck position logging goes through logging (silent unless the app
+# configures it) so a slow stdout can never stall the emit loop
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
 
 class TruckGPSConnector(pw.io.python.ConnectorSubject):
     """
@@ -43,6 +50,98 @@ class TruckGPSConnector(pw.io.python.ConnectorSubject):
             truck['current_position'] = truck['route'][0] if truck['route'] else [0, 0]
             truck['status'] = 'on-time'
             truck['progress'] = 0.0  # Progress along current segment (0.0 to 1.0)
+            self._set_route_derived(truck)
+        self._build_route_arrays()
+
+    def _build_route_arrays(self):
+        """
+        Pack every truck's route and motion state into NumPy arrays (SoA).
+
+        _advance_trucks moves the whole fleet with a few array operations
+        per tick instead of walking each truck's Python lists. Routes are
+        padded to the longest one; route_lens marks each truck's real length.
+        Rebuild after any route or velocity change.
+        """
+        n_trucks = len(self.trucks)
+        max_points = max([len(truck['route']) for truck in self.trucks] + [2])
+
+        self._routes = np.zeros((n_trucks, max_points, 2), dtype=np.float64)
+        self._rates = np.ones((n_trucks, max_points - 1), dtype=np.float64)
+        self._route_lens = np.zeros(n_trucks, dtype=np.int64)
+        for i, truck in enumerate(self.trucks):
+            n_points = len(truck['route'])
+            if n_points:
+                self._routes[i, :n_points] = truck['route']
+            self._rates[i, :len(truck['progress_per_sec'])] = truck['progress_per_sec']
+            self._route_lens[i] = n_points
+
+        self._route_index = np.array([truck['route_index'] for truck in self.trucks], dtype=np.int64)
+        self._progress = np.array([truck['progress'] for truck in self.trucks], dtype=np.float64)
+        self._truck_rows = np.arange(n_trucks)
+
+    def _set_route_derived(self, truck: Dict):
+        """
+        Recompute everything derived from the truck's route and velocity.
+
+        The serialized route and static payload prefix are invalidated and
+        rebuilt lazily on the next emit.
+        """
+        truck['route_json'] = None
+        truck['_static'] = None
+        truck['seg_len'] = self._segment_lengths(truck['route'])
+        # Velocity is fixed per truck, so the progress made per 1s tick on
+        # each segment is a constant too
+        velocity_km_per_sec = truck['velocity'] / 3600.0
+        truck['progress_per_sec'] = [
+            velocity_km_per_sec / d if d > 0 else 1.0  # avoid division by zero
+            for d in truck['seg_len']
+        ]
+
+    def reroute_truck(self, truck: Dict, route: List[List[float]]):
+        """Give a truck a new route, restarting it at the route's first waypoint"""
+        truck['route'] = route
+        truck['route_index'] = 0
+        truck['progress'] = 0.0
+        truck['current_position'] = route[0] if route else [0, 0]
+        self._set_route_derived(truck)
+        self._build_route_arrays()
+
+    @staticmethod
+    def _static_prefix(truck: Dict) -> bytes:
+        """
+        Serialized immutable fields of a truck's payload, built once per route.
+
+        The route is the largest field and never changes between ticks, so
+        it is serialized once here instead of every second. Returned as an
+        open JSON object (no closing brace); _emit_tick appends the per-tick
+        fields.
+        """
+        if truck['_static'] is None:
+            if truck['route_json'] is None:
+                truck['route_json'] = orjson.dumps(truck['route']).decode()
+            truck['_static'] = orjson.dumps({
+                "truck_id": truck['id'],
+                "driver": truck['driver'],
+                "cargo_value": truck['cargo_value'],
+                "contract_id": truck['contract_id'],
+                "route": truck['route_json']
+            })[:-1]
+        return truck['_static']
+
+    @staticmethod
+    def _segment_lengths(route: List[List[float]]) -> List[float]:
+        """
+        Precompute the length in km of every route segment in one vectorized pass.
+
+        Same approximation as _calculate_distance, applied to the whole
+        (M, 2) [lon, lat] array at once.
+        """
+        points = np.asarray(route, dtype=np.float64).reshape(-1, 2)
+        diffs = np.diff(points, axis=0)
+        lon_scale = np.cos(np.radians(points[:-1, 1])) * 111.0
+        lengths = np.sqrt((diffs[:, 1] * 111.0) ** 2 + (diffs[:, 0] * lon_scale) ** 2)
+        # Plain floats: cheaper to index per tick and serializable by orjson
+        return lengths.tolist()
 
     def _calculate_distance(self, point1: List[float], point2: List[float]) -> float:
         """Calculate approximate distance in km between two lat/lon points"""
@@ -70,48 +169,137 @@ class TruckGPSConnector(pw.io.python.ConnectorSubject):
         
         This method runs continuously, emitting GPS updates every second.
         Each emission creates a new row in the Pathway streaming table.
+        Pathway calls it on its own thread (ConnectorSubject.start), so the
+        blocking sleep never stalls the engine.
         """
         print("🚀 GPS Connector started - emitting data every 1 second")
 
         iteration = 0
+        # Deadline-based schedule so the period stays 1s regardless of how
+        # long the emission itself takes (sleep(1) after work drifts)
+        next_tick = time.monotonic()
         while True:
-            for truck in self.trucks:
-                # Update truck position along route
-                self._update_truck_position(truck)
-
-                # Emit data to Pathway stream using self.next_json()
-                # Convert the data to a dictionary and use next_json
-                data = {
-                    "truck_id": truck['id'],
-                    "driver": truck['driver'],
-                    "lat": truck['current_position'][1],
-                    "lon": truck['current_position'][0],
-                    "velocity": float(truck['velocity']),
-                    "cargo_value": truck['cargo_value'],
-                    "contract_id": truck['contract_id'],
-                    "status": truck['status'],
-                    "timestamp": int(datetime.now().timestamp()),
-                    "route": json.dumps(truck['route'])
-                }
-
-                self.next_json(data)
-
-                if iteration % 10 == 0:  # Log every 10 seconds
-                    route_segment = f"segment {truck['route_index']}/{len(truck['route']) - 1}"
-                    print(f"📍 {truck['id']}: position [{truck['current_position'][0]:.4f}, "
-                          f"{truck['current_position'][1]:.4f}], {route_segment}, "
-                          f"progress {truck['progress']:.2f}, velocity {truck['velocity']} km/h")
-
-            # IMPORTANT: Commit the data so Pathway starts processing it
-            self.commit()
+            self._emit_tick(iteration)
+            iteration += 1
+
+            # Update frequency: 1 second
+            next_tick, delay = self._next_delay(next_tick)
+            if delay > 0:
+                time.sleep(delay)
+
+    async def run_async(self):
+        """
+        Same loop as run(), for driving the connector from an asyncio app.
 
+        Waits with asyncio.sleep between ticks so other coroutines on the
+        loop (e.g. the WebSocket broadcaster) keep running. To reuse the
+        threaded run() instead, use `await asyncio.to_thread(connector.run)`.
+        """
+        print("🚀 GPS Connector started (async) - emitting data every 1 second")
+
+        iteration = 0
+        next_tick = time.monotonic()
+        while True:
+            self._emit_tick(iteration)
             iteration += 1
-            time.sleep(1)  # Update frequency: 1 second
+
+            next_tick, delay = self._next_delay(next_tick)
+            await asyncio.sleep(max(delay, 0))
+
+    @staticmethod
+    def _next_delay(next_tick: float):
+        """Advance the 1s deadline and return (next_tick, seconds to wait)"""
+        next_tick += 1.0
+        delay = next_tick - time.monotonic()
+        if delay <= 0:
+            # Fell behind - resync instead of emitting a burst of catch-up ticks
+            next_tick = time.monotonic()
+        return next_tick, delay
+
+    def _emit_tick(self, iteration: int):
+        """Advance every truck one second, emit all rows and commit them as one batch"""
+        log_positions = iteration % 10 == 0 and logger.isEnabledFor(logging.DEBUG)
+
+        # Every truck in a tick shares one timestamp (integer ns math, no float rounding)
+        ts = time.time_ns() // 1_000_000_000
+
+        # Update every truck's position along its route in one vectorized step
+        self._advance_trucks()
+
+        for truck in self.trucks:
+            # Emit data to Pathway stream as raw JSON bytes: the
+            # pre-rendered static prefix joined with the per-tick fields
+            # (next_json would re-serialize everything with stdlib json)
+            dynamic = orjson.dumps({
+                "lat": truck['current_position'][1],
+                "lon": truck['current_position'][0],
+                "velocity": float(truck['velocity']),
+                "status": truck['status'],
+                "timestamp": ts
+            })
+
+            self.next_bytes(self._static_prefix(truck) + b"," + dynamic[1:])
+
+            if log_positions:  # Log every 10 seconds
+                logger.debug(
+                    "📍 %s: position [%.4f, %.4f], segment %d/%d, progress %.2f, velocity %s km/h",
+                    truck['id'], truck['current_position'][0], truck['current_position'][1],
+                    truck['route_index'], len(truck['route']) - 1, truck['progress'], truck['velocity']
+                )
+
+        # IMPORTANT: Commit the data so Pathway starts processing it
+        self.commit()
+
+        if iteration % 10 == 0:
+            logger.info("📍 GPS tick %d: emitted %d trucks", iteration, len(self.trucks))
+
+    def _advance_trucks(self):
+        """
+        Move every truck one second along its route, on the SoA arrays.
+
+        Vectorized equivalent of calling _update_truck_position on each
+        truck; the resulting route_index, progress and current_position are
+        written back to the truck dicts for emission.
+        """
+        rows = self._truck_rows
+        idx = self._route_index
+        last = self._route_lens - 1
+
+        # Trucks at the end of their route restart from the first waypoint
+        wrap = idx >= last
+        seg = np.where(wrap, 0, idx)
+
+        progress = np.where(wrap, 0.0, self._progress + self._rates[rows, seg])
+        advance = ~wrap & (progress >= 1.0)
+        new_idx = np.where(wrap, 0, np.where(advance, np.minimum(idx + 1, last), idx))
+        progress[advance] = 0.0
+
+        # Interpolate within the current segment; trucks that wrapped or
+        # reached a waypoint sit exactly on it
+        start = self._routes[rows, seg]
+        end = self._routes[rows, seg + 1]
+        positions = np.where(
+            (wrap | advance)[:, np.newaxis],
+            self._routes[rows, new_idx],
+            start + (end - start) * progress[:, np.newaxis]
+        )
+
+        self._route_index = new_idx
+        self._progress = progress
+
+        for truck, route_index, truck_progress, position in zip(
+                self.trucks, new_idx.tolist(), progress.tolist(), positions.tolist()):
+            truck['route_index'] = route_index
+            truck['progress'] = truck_progress
+            truck['current_position'] = position
 
     def _update_truck_position(self, truck: Dict):
         """
         Move truck smoothly along its route based on velocity.
         Uses linear interpolation between waypoints.
+
+        Scalar reference for _advance_trucks (which run() uses); it only
+        updates the truck dict, not the SoA arrays.
         """
         route = truck['route']
         current_idx = truck['route_index']
@@ -127,21 +315,8 @@ class TruckGPSConnector(pw.io.python.ConnectorSubject):
         start_point = route[current_idx]
         end_point = route[current_idx + 1]
 
-        # Calculate how far truck moves in 1 second at current velocity
-        # velocity is in km/h, convert to km/second
-        velocity_km_per_sec = truck['velocity'] / 3600.0
-
-        # Calculate distance of current segment
-        segment_distance = self._calculate_distance(start_point, end_point)
-
-        # Calculate progress increment (avoid division by zero)
-        if segment_distance > 0:
-            progress_increment = velocity_km_per_sec / segment_distance
-        else:
-            progress_increment = 1.0
-
-        # Update progress along current segment
-        truck['progress'] += progress_increment
+        # Update progress along current segment (rate precomputed at init)
+        truck['progress'] += truck['progress_per_sec'][current_idx]
 
         if truck['progress'] >= 1.0:
             # Move to next segment
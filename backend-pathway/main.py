@@ -4,11 +4,13 @@ Main orchestration file for the supply chain monitoring system
 """
 
 import pathway as pw
+import logging
 import os
 from dotenv import load_dotenv
 from connectors.gps_connector import TruckGPSConnector
 from transformations.delay_detection import apply_all_transformations
 from transformations.demo_scenario import apply_demo_scenario
+from adapters.jsonlines_output import write_jsonlines
 # Team C: LLM/Contract RAG imports
 from llm.contract_rag import (
     ContractRAGPipeline,
@@ -18,6 +20,16 @@ from llm.contract_rag import (
 # Load environment variables
 load_dotenv()
 
+# Same format Pathway uses by default; LOGLEVEL=DEBUG shows per-row details
+logging.basicConfig(
+    level=os.getenv('LOGLEVEL', 'INFO').upper(),
+    format="[%(asctime)s]:%(levelname)s:%(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%S",
+)
+
+# Directory the pipeline writes its JSON lines files to
+OUTPUT_DIR = os.getenv('OUTPUT_DIR', 'output')
+
 # Import truck configurations from existing backend
 TRUCKS_CONFIG = [
     {
@@ -140,20 +152,20 @@ def main():
 
     print("✅ Transformations configured")
 
-    # Step 3: Output to JSON files
+    # Step 3: Output to JSON files (byte-buffered, one write per batch)
     print("\n💾 Setting up output...")
 
-    pw.io.jsonlines.write(truck_positions, "output/gps_stream.jsonl")
-    pw.io.jsonlines.write(status_stream, "output/truck_status.jsonl")
-    pw.io.jsonlines.write(events_stream, "output/events.jsonl")
+    write_jsonlines(truck_positions, os.path.join(OUTPUT_DIR, 'gps_stream.jsonl'))
+    write_jsonlines(status_stream, os.path.join(OUTPUT_DIR, 'truck_status.jsonl'))
+    write_jsonlines(events_stream, os.path.join(OUTPUT_DIR, 'events.jsonl'))
     # Team C: Output arbitrage opportunities
-    pw.io.jsonlines.write(arbitrage_stream, "output/arbitrage_opportunities.jsonl")
+    write_jsonlines(arbitrage_stream, os.path.join(OUTPUT_DIR, 'arbitrage_opportunities.jsonl'))
 
     print("✅ Output configured:")
-    print("   - output/gps_stream.jsonl (raw GPS data)")
-    print("   - output/truck_status.jsonl (with delays detected)")
-    print("   - output/events.jsonl (status change events)")
-    print("   - output/arbitrage_opportunities.jsonl (AI-powered arbitrage)")
+    print(f"   - {OUTPUT_DIR}/gps_stream.jsonl (raw GPS data)")
+    print(f"   - {OUTPUT_DIR}/truck_status.jsonl (with delays detected)")
+    print(f"   - {OUTPUT_DIR}/events.jsonl (status change events)")
+    print(f"   - {OUTPUT_DIR}/arbitrage_opportunities.jsonl (AI-powered arbitrage)")
 
     # Step 4: Run the pipeline
     print("\n" + "=" * 60)
@@ -165,6 +177,11 @@ def main():
     print("Press Ctrl+C to stop")
     print("=" * 60 + "\n")
 
+    # Worker threads for the engine (PATHWAY_THREADS wins if already set);
+    # joins and groupbys are sharded across them by key, e.g. contract_id
+    threads = os.environ.setdefault('PATHWAY_THREADS', os.getenv('PW_THREADS', '4'))
+    print(f"🧵 Pathway worker threads: {threads}\n")
+
     # This starts the streaming engine - it will run indefinitely
     pw.run()
 
@@ -172,7 +189,7 @@ def main():
 if __name__ == "__main__":
     try:
         # Create output directory
-        os.makedirs("output", exist_ok=True)
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
 
         main()
     except KeyboardInterrupt:
@@ -0,0 +1,28 @@
+"""
+Shared pytest configuration
+
+The suite can run in parallel with pytest-xdist:
+
+    pytest -n auto --dist loadgroup tests/
+
+Tests that start main.py or read its output/ files share one xdist group,
+so they stay on a single worker, in file order, and never race on output/.
+"""
+
+import pytest
+
+PIPELINE_OUTPUT_GROUP = "pipeline_output"
+
+# Tests outside test_integration.py that read output/ files
+OUTPUT_READERS = {"test_output_format"}
+
+
+def pytest_configure(config):
+    if not config.pluginmanager.hasplugin("xdist"):
+        config.addinivalue_line("markers", "xdist_group(name): run on one xdist worker")
+
+
+def pytest_collection_modifyitems(config, items):
+    for item in items:
+        if item.module.__name__.endswith("test_integration") or item.name in OUTPUT_READERS:
+            item.add_marker(pytest.mark.xdist_group(PIPELINE_OUTPUT_GROUP))
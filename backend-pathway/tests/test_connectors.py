@@ -5,6 +5,7 @@ Unit tests for Pathway connectors
 import pathway as pw
 from connectors.gps_connector import TruckGPSConnector
 import json
+import math
 import time
 import os
 
@@ -58,6 +59,92 @@ def test_position_update():
     print("✅ Position update test passed")
 
 
+def test_precomputed_progress_rates():
+    """Test precomputed segment progress rates match the per-tick calculation"""
+    route = [[73.8567, 18.5204], [73.5000, 18.7000], [73.5000, 18.7000], [72.8777, 19.0760]]
+    trucks = [{
+        "id": "TEST-001",
+        "driver": "Test Driver",
+        "route": route,
+        "velocity": 68,
+        "cargo_value": 10000,
+        "contract_id": "TEST-CNT"
+    }]
+
+    connector = TruckGPSConnector(trucks)
+    truck = connector.trucks[0]
+
+    assert len(truck['progress_per_sec']) == len(route) - 1
+
+    for i in range(len(route) - 1):
+        distance = connector._calculate_distance(route[i], route[i + 1])
+        expected = (68 / 3600.0) / distance if distance > 0 else 1.0
+        assert math.isclose(truck['seg_len'][i], distance), f"Segment {i} length mismatch"
+        assert math.isclose(truck['progress_per_sec'][i], expected), f"Segment {i} rate mismatch"
+
+    # Zero-length segment is crossed in a single tick
+    assert truck['progress_per_sec'][1] == 1.0
+
+    print("✅ Precomputed progress rate test passed")
+
+
+def test_reroute_invalidates_route_json():
+    """Test the cached route JSON is rebuilt after a reroute"""
+    trucks = [{
+        "id": "TEST-001",
+        "driver": "Test Driver",
+        "route": [[73.8567, 18.5204], [73.5000, 18.7000]],
+        "velocity": 68,
+        "cargo_value": 10000,
+        "contract_id": "TEST-CNT"
+    }]
+
+    connector = TruckGPSConnector(trucks)
+    truck = connector.trucks[0]
+
+    first = json.loads(connector._static_prefix(truck) + b"}")
+    assert json.loads(first['route']) == truck['route']
+
+    new_route = [[72.8777, 19.0760], [73.2000, 18.9000], [73.5000, 18.7000]]
+    connector.reroute_truck(truck, new_route)
+    assert truck['route_json'] is None, "Reroute did not invalidate the cached route"
+    assert len(truck['progress_per_sec']) == len(new_route) - 1
+
+    second = json.loads(connector._static_prefix(truck) + b"}")
+    assert json.loads(second['route']) == new_route
+    assert truck['current_position'] == new_route[0]
+
+    print("✅ Reroute cache invalidation test passed")
+
+
+def test_vectorized_advance_matches_scalar():
+    """Test the vectorized fleet update moves trucks exactly like the per-truck update"""
+    def make_trucks():
+        return [
+            {"id": "TEST-001", "driver": "A", "route": [[73.8567, 18.5204], [73.5000, 18.7000], [72.8777, 19.0760]],
+             "velocity": 5000, "cargo_value": 1, "contract_id": "C1"},
+            {"id": "TEST-002", "driver": "B", "route": [[0, 0], [0, 0], [1, 1], [2, 2], [3, 3]],
+             "velocity": 20000, "cargo_value": 1, "contract_id": "C2"},
+            {"id": "TEST-003", "driver": "C", "route": [[77.59, 12.97]],
+             "velocity": 60, "cargo_value": 1, "contract_id": "C3"}
+        ]
+
+    vectorized = TruckGPSConnector(make_trucks())
+    scalar = TruckGPSConnector(make_trucks())
+
+    for tick in range(200):
+        vectorized._advance_trucks()
+        for truck in scalar.trucks:
+            scalar._update_truck_position(truck)
+
+        for v, s in zip(vectorized.trucks, scalar.trucks):
+            assert v['route_index'] == s['route_index'], f"Tick {tick}: {v['id']} index mismatch"
+            assert v['progress'] == s['progress'], f"Tick {tick}: {v['id']} progress mismatch"
+            assert list(v['current_position']) == list(s['current_position']), f"Tick {tick}: {v['id']} position mismatch"
+
+    print("✅ Vectorized advance test passed")
+
+
 def test_output_format():
     """Test that output matches expected format"""
     expected_fields = [
@@ -88,6 +175,9 @@ if __name__ == "__main__":
 
     test_gps_connector_initialization()
     test_position_update()
+    test_precomputed_progress_rates()
+    test_reroute_invalidates_route_json()
+    test_vectorized_advance_matches_scalar()
     test_output_format()
 
     print("\n✅ All Team A tests passed!")
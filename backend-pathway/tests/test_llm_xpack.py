@@ -4,17 +4,67 @@ Tests for LLM xPack / Contract RAG Integration (Team C)
 
 import os
 import sys
-import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import orjson
+
+try:
+    import msgspec
+except ImportError:  # Optional - contracts are then checked field by field
+    msgspec = None
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import llm.contract_rag as contract_rag
 from llm.contract_rag import (
     setup_contract_stream,
     ContractAnalyzer,
     calculate_arbitrage_opportunity
 )
 
+# Contract document fields the pipeline relies on, with their JSON types
+CONTRACT_FIELDS = {
+    'contract_id': str,
+    'terms': str,
+    'penalty_per_hour': (int, float),
+    # Check for spot_market_alternatives (JSON file format)
+    'spot_market_alternatives': list
+}
+
+if msgspec is not None:
+    class Contract(msgspec.Struct):
+        """Typed view of a contract document (other fields are ignored)"""
+        contract_id: str
+        terms: str
+        penalty_per_hour: float
+        spot_market_alternatives: list
+
+# One analyzer (and OpenAI client) shared by every test, see get_analyzer()
+_ANALYZER = None
+
+
+def get_analyzer():
+    """Return the module's shared ContractAnalyzer, creating it on first use"""
+    global _ANALYZER
+    if _ANALYZER is None:
+        _ANALYZER = ContractAnalyzer()
+    return _ANALYZER
+
+
+def _load_contract(path):
+    """Parse and validate one contract file; raises if a field is missing or mistyped"""
+    raw = Path(path).read_bytes()
+    if msgspec is not None:
+        return msgspec.json.decode(raw, type=Contract)
+
+    data = orjson.loads(raw)
+    for field, kind in CONTRACT_FIELDS.items():
+        assert field in data, f"{os.path.basename(path)} missing {field}"
+        assert isinstance(data[field], kind), f"{os.path.basename(path)} has invalid {field}"
+    return data
+
 
 def test_contract_files_exist():
     """Verify contract files are readable"""
@@ -29,19 +79,13 @@ def test_contract_files_exist():
         'CNT-2024-003.json'
     ]
 
-    for cf in contract_files:
-        path = os.path.join(contract_dir, cf)
+    paths = [os.path.join(contract_dir, cf) for cf in contract_files]
+    for cf, path in zip(contract_files, paths):
         assert os.path.exists(path), f"Missing {cf}"
 
-        # Verify JSON is valid
-        with open(path) as f:
-            data = json.load(f)
-            assert 'contract_id' in data, f"{cf} missing contract_id"
-            assert 'terms' in data, f"{cf} missing terms"
-            assert 'penalty_per_hour' in data, f"{cf} missing penalty_per_hour"
-            # Check for spot_market_alternatives (JSON file format)
-            assert 'spot_market_alternatives' in data, f"{cf} missing spot_market_alternatives"
-
+    # Read and validate the files concurrently (the work is mostly I/O)
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        for cf, _ in zip(contract_files, pool.map(_load_contract, paths)):
             print(f"  ✅ {cf}: Valid")
 
     print("✅ Contract files test passed\n")
@@ -64,7 +108,7 @@ def test_analyzer_initialization():
     """Test that ContractAnalyzer can be initialized"""
     print("📋 Test 3: Analyzer initialization")
 
-    analyzer = ContractAnalyzer()
+    analyzer = get_analyzer()
     assert analyzer is not None, "Analyzer failed to initialize"
 
     # Check if OpenAI client is available
@@ -80,7 +124,7 @@ def test_arbitrage_calculation_with_savings():
     """Test arbitrage logic when savings exist"""
     print("📋 Test 4: Arbitrage calculation (positive savings)")
 
-    analyzer = ContractAnalyzer()
+    analyzer = get_analyzer()
 
     truck_id = "TEST-001"
     contract_id = "TEST-CNT"
@@ -93,7 +137,7 @@ def test_arbitrage_calculation_with_savings():
     alternative_reliability = 0.95
     contract_terms = "Test contract with standard penalty terms"
 
-    result_json = calculate_arbitrage_opportunity(
+    result = calculate_arbitrage_opportunity(
         truck_id=truck_id,
         contract_id=contract_id,
         velocity=velocity,
@@ -107,8 +151,6 @@ def test_arbitrage_calculation_with_savings():
         analyzer=analyzer
     )
 
-    result = json.loads(result_json)
-
     # Verify calculation (2.5 hours * $500/hour = $1250 penalty vs $800 cost)
     assert result['projected_penalty'] == 1250.0, f"Expected penalty 1250, got {result['projected_penalty']}"
     assert result['solution_cost'] == 800, f"Expected cost 800, got {result['solution_cost']}"
@@ -126,7 +168,7 @@ def test_arbitrage_calculation_no_savings():
     """Test when alternative is more expensive"""
     print("📋 Test 5: Arbitrage calculation (no savings)")
 
-    analyzer = ContractAnalyzer()
+    analyzer = get_analyzer()
 
     truck_id = "TEST-002"
     contract_id = "TEST-CNT-2"
@@ -139,7 +181,7 @@ def test_arbitrage_calculation_no_savings():
     alternative_reliability = 0.99
     contract_terms = "Test contract with low penalties"
 
-    result_json = calculate_arbitrage_opportunity(
+    result = calculate_arbitrage_opportunity(
         truck_id=truck_id,
         contract_id=contract_id,
         velocity=velocity,
@@ -153,8 +195,6 @@ def test_arbitrage_calculation_no_savings():
         analyzer=analyzer
     )
 
-    result = json.loads(result_json)
-
     # Should recommend WAIT when no savings (2.5 * 200 = 500 < 1500)
     assert result['recommendation'] == 'WAIT', f"Expected WAIT, got {result['recommendation']}"
     assert result['net_savings'] < 0, f"Expected negative savings, got {result['net_savings']}"
@@ -181,10 +221,10 @@ def test_max_penalty_cap():
     """Test that penalty is capped at max_penalty"""
     print("📋 Test 7: Maximum penalty cap")
 
-    analyzer = ContractAnalyzer()
+    analyzer = get_analyzer()
 
     # High penalty per hour but low max penalty
-    result_json = calculate_arbitrage_opportunity(
+    result = calculate_arbitrage_opportunity(
         truck_id="TEST-004",
         contract_id="TEST-CNT-4",
         velocity=0,
@@ -198,8 +238,6 @@ def test_max_penalty_cap():
         analyzer=analyzer
     )
 
-    result = json.loads(result_json)
-
     # 2.5 hours * 2000 = 5000, but should be capped at 1000
     assert result['projected_penalty'] == 1000, f"Expected capped penalty 1000, got {result['projected_penalty']}"
     assert result['net_savings'] == 500, f"Expected savings 500, got {result['net_savings']}"
@@ -208,6 +246,39 @@ def test_max_penalty_cap():
     print("✅ Penalty cap test passed\n")
 
 
+def test_rule_based_without_analyzer():
+    """Test that rule-based mode creates no analyzer (or event loop) per call"""
+    print("📋 Test 8: Rule-based analysis without an analyzer")
+
+    if get_analyzer().pipeline.use_llm:
+        print("  ⚠️  OpenAI key configured - rule-based path not used, skipping")
+        return
+
+    class NoAnalyzer:
+        def __init__(self):
+            raise AssertionError("ContractAnalyzer created in rule-based mode")
+
+    real_analyzer, contract_rag.ContractAnalyzer = contract_rag.ContractAnalyzer, NoAnalyzer
+    try:
+        result = calculate_arbitrage_opportunity(
+            truck_id="TEST-005",
+            contract_id="TEST-CNT-5",
+            velocity=0,
+            penalty_per_hour=500,
+            max_penalty=2500,
+            alternative_provider="TestFreight",
+            alternative_cost=800,
+            alternative_eta=45,
+            alternative_reliability=0.95
+        )
+    finally:
+        contract_rag.ContractAnalyzer = real_analyzer
+
+    assert result['net_savings'] == 450.0, f"Expected savings 450, got {result['net_savings']}"
+    print("  ✅ Rule-based result without creating an analyzer")
+    print("✅ No-analyzer test passed\n")
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("🧪 Running Team C Tests (LLM/Contract RAG Integration)")
@@ -221,6 +292,7 @@ if __name__ == "__main__":
         test_arbitrage_calculation_no_savings()
         test_arbitrage_no_alternatives()
         test_max_penalty_cap()
+        test_rule_based_without_analyzer()
 
         print("=" * 60)
         print("✅ ALL TEAM C TESTS PASSED!")
@@ -3,9 +3,38 @@ Pathway Streaming Transformations for Delay Detection
 Simplified version for Pathway 0.2.0 compatibility
 """
 
+import numpy as np
 import pathway as pw
 from typing import Optional
-import time
+
+# Velocity thresholds (km/h): below CRITICAL_VELOCITY a truck is critical,
+# below DELAYED_VELOCITY delayed, otherwise on-time
+CRITICAL_VELOCITY = 10
+DELAYED_VELOCITY = 40
+
+# Status names indexed by the number of thresholds a velocity clears
+_STATUS_ARR = np.array(['critical', 'delayed', 'on-time'])
+
+
+def classify(velocities: np.ndarray) -> np.ndarray:
+    """
+    Classify a batch of velocities with the same thresholds as detect_delays.
+
+    Branchless: each velocity's index is the sum of two vectorized compares
+    (0 = critical, 1 = delayed, 2 = on-time).
+
+    Args:
+        velocities: Array of velocities in km/h
+
+    Returns:
+        Array of status strings, one per velocity
+    """
+    velocities = np.asarray(velocities)
+    status_idx = (
+        (velocities >= CRITICAL_VELOCITY).astype(np.uint8)
+        + (velocities >= DELAYED_VELOCITY).astype(np.uint8)
+    )
+    return _STATUS_ARR[status_idx]
 
 
 def monitor_velocity_windows(gps_stream: pw.Table) -> pw.Table:
@@ -21,8 +50,10 @@ def monitor_velocity_windows(gps_stream: pw.Table) -> pw.Table:
         Table with velocity statistics per truck
     """
 
-    # Group by truck_id and calculate velocity statistics
-    velocity_window = (
+    # Group by truck_id and calculate velocity statistics; the "current"
+    # fields come from each truck's latest reading, found with one argmax
+    # instead of a reducers.any() per column
+    velocity_stats = (
         gps_stream
         .groupby(pw.this.truck_id)
         .reduce(
@@ -30,16 +61,27 @@ def monitor_velocity_windows(gps_stream: pw.Table) -> pw.Table:
             avg_velocity=pw.reducers.avg(pw.this.velocity),
             min_velocity=pw.reducers.min(pw.this.velocity),
             max_velocity=pw.reducers.max(pw.this.velocity),
-            current_velocity=pw.reducers.any(pw.this.velocity),
-            current_lat=pw.reducers.any(pw.this.lat),
-            current_lon=pw.reducers.any(pw.this.lon),
-            driver=pw.reducers.any(pw.this.driver),
-            cargo_value=pw.reducers.any(pw.this.cargo_value),
-            contract_id=pw.reducers.any(pw.this.contract_id),
-            route=pw.reducers.any(pw.this.route)
+            latest_id=pw.reducers.argmax(pw.this.timestamp),
+            timestamp=pw.reducers.max(pw.this.timestamp)
         )
     )
 
+    latest = gps_stream.ix(velocity_stats.latest_id)
+    velocity_window = velocity_stats.select(
+        pw.this.truck_id,
+        pw.this.avg_velocity,
+        pw.this.min_velocity,
+        pw.this.max_velocity,
+        current_velocity=latest.velocity,
+        current_lat=latest.lat,
+        current_lon=latest.lon,
+        driver=latest.driver,
+        cargo_value=latest.cargo_value,
+        contract_id=latest.contract_id,
+        route=latest.route,
+        timestamp=pw.this.timestamp
+    )
+
     return velocity_window
 
 
@@ -59,16 +101,8 @@ def detect_delays(velocity_stream: pw.Table) -> pw.Table:
         Table with status field added
     """
 
-    def calculate_status(velocity: float) -> str:
-        """Determine truck status based on current velocity"""
-        if velocity < 10:
-            return 'critical'
-        elif velocity < 40:
-            return 'delayed'
-        else:
-            return 'on-time'
-
-    # Apply status calculation
+    # Status from the velocity thresholds, evaluated by the engine
+    # (no Python call per row)
     status_stream = velocity_stream.select(
         pw.this.truck_id,
         pw.this.driver,
@@ -81,7 +115,12 @@ def detect_delays(velocity_stream: pw.Table) -> pw.Table:
         cargo_value=pw.this.cargo_value,
         contract_id=pw.this.contract_id,
         route=pw.this.route,
-        status=pw.apply(calculate_status, pw.this.current_velocity)
+        timestamp=pw.this.timestamp,
+        status=pw.if_else(
+            pw.this.current_velocity < CRITICAL_VELOCITY,
+            'critical',
+            pw.if_else(pw.this.current_velocity < DELAYED_VELOCITY, 'delayed', 'on-time')
+        )
     )
 
     return status_stream
@@ -100,28 +139,33 @@ def generate_delay_events(status_stream: pw.Table) -> pw.Table:
         Table of events (status changes, alerts)
     """
 
-    # Filter for delayed or critical trucks
-    problematic_trucks = status_stream.filter(
-        (pw.this.status == 'delayed') | (pw.this.status == 'critical')
-    )
+    # Filter for delayed or critical trucks - one numeric compare on the
+    # velocity the status was derived from, instead of two string compares
+    problematic_trucks = status_stream.filter(pw.this.current_velocity < DELAYED_VELOCITY)
 
-    # Create event messages
+    # Velocity in tenths of km/h, so the message can print it with one
+    # decimal ("{:.1f}") using integer column math
+    velocity_tenths = pw.cast(int, (pw.this.current_velocity * 10).num.round(0))
+
+    # Create event messages - every column is a native expression evaluated
+    # in the one select after the filter (string concatenation, no Python
+    # call per event); event_type reuses the numeric threshold like the filter
     events = problematic_trucks.select(
-        event_id=pw.apply(lambda tid: f"evt-delay-{tid}", pw.this.truck_id),
+        event_id="evt-delay-" + pw.this.truck_id,
         truck_id=pw.this.truck_id,
         event_type=pw.if_else(
-            pw.this.status == 'critical',
+            pw.this.current_velocity < CRITICAL_VELOCITY,
             'alert',
             'warning'
         ),
         severity=pw.this.status,
-        message=pw.apply(
-            lambda tid, vel, status: f"⚠️ {tid} {status.upper()} - Velocity: {vel:.1f} km/h",
-            pw.this.truck_id,
-            pw.this.current_velocity,
-            pw.this.status
+        message=(
+            "⚠️ " + pw.this.truck_id + " " + pw.this.status.str.upper()
+            + " - Velocity: " + pw.cast(str, velocity_tenths // 10) + "." + pw.cast(str, velocity_tenths % 10)
+            + " km/h"
         ),
-        timestamp=pw.apply(lambda tid: int(time.time()), pw.this.truck_id)
+        # Time of the latest GPS reading behind the status (event time)
+        timestamp=pw.this.timestamp
     )
 
     return events
@@ -140,32 +184,19 @@ def calculate_eta(status_stream: pw.Table) -> pw.Table:
         Table with ETA field added
     """
 
-    def estimate_eta(velocity: float, cargo_value: int) -> float:
-        """
-        Estimate hours to destination.
-        Simplified: assumes 150km average distance
-        """
-        if velocity < 5:
-            return 999.0  # Essentially stopped
-
-        distance_km = 150  # Simplified assumption
-        eta_hours = distance_km / velocity
-        return round(eta_hours, 2)
-
-    eta_stream = status_stream.select(
-        pw.this.truck_id,
-        pw.this.driver,
-        pw.this.current_lat,
-        pw.this.current_lon,
-        pw.this.current_velocity,
-        pw.this.avg_velocity,
-        pw.this.min_velocity,
-        pw.this.max_velocity,
-        pw.this.cargo_value,
-        pw.this.contract_id,
-        pw.this.route,
-        pw.this.status,
-        eta_hours=pw.apply(estimate_eta, pw.this.current_velocity, pw.this.cargo_value)
+    # Hours to destination, as an engine expression (no Python call per row).
+    # Simplified: assumes 150km average distance; below 5 km/h the truck is
+    # essentially stopped and gets 999.0
+    distance_km = 150.0
+
+    # Only eta_hours is computed here; with_columns keeps the status columns
+    # (cargo_value, route, ...) as they are instead of re-selecting each one
+    eta_stream = status_stream.with_columns(
+        eta_hours=pw.if_else(
+            pw.this.current_velocity < 5,
+            999.0,
+            (distance_km / pw.this.current_velocity).num.round(2)
+        )
     )
 
     return eta_stream
@@ -3,77 +3,69 @@ Demo Scenario Control for Hackathon Presentation
 Triggers specific events at specific times to showcase delay detection
 """
 
-import pathway as pw
-import time
-
+import os
+from typing import Optional
 
-class DemoScenarioController:
-    """
-    Controls demo scenario timing for hackathon presentation.
-    
-    Timeline:
-    - T+5s: TRK-402 velocity drops to 0
-    - T+8s: Status escalates to CRITICAL
-    - T+12s: Arbitrage opportunity triggered
-    """
-
-    def __init__(self):
-        self.start_time = None
-        self.scenario_executed = {
-            't5_delay': False,
-            't8_critical': False
-        }
+import pathway as pw
 
-    def modify_velocity_for_demo(self, gps_stream: pw.Table) -> pw.Table:
-        """
-        Inject demo scenario: Make TRK-402 stop after 5 seconds.
-        
-        This simulates a realistic delay for demonstration purposes.
-        """
+# Demo timeline:
+# - T+5s: TRK-402 velocity drops to 0 (and stays there)
+# - T+8s: Status escalates to CRITICAL
+# - T+12s: Arbitrage opportunity triggered
+DEMO_TRUCK_ID = "TRK-402"
+DEMO_STOP_AFTER = 5  # seconds after the truck's first reading
 
-        def apply_demo_scenario(truck_id: str, velocity: float, timestamp: int) -> float:
-            """Modify velocity based on demo timeline"""
-            if truck_id != "TRK-402":
-                return float(velocity)  # Other trucks unaffected
+# Fixed demo start (unix seconds), e.g. for replaying recorded GPS data;
+# 0 starts each truck's demo clock at its first reading
+DEMO_START_TS = int(os.getenv('DEMO_START_TS', '0'))
 
-            # Initialize start time on first call
-            if self.start_time is None:
-                self.start_time = timestamp
 
-            elapsed = timestamp - self.start_time
+def modify_velocity_for_demo(gps_stream: pw.Table, start_time: Optional[int] = None) -> pw.Table:
+    """
+    Inject demo scenario: Make TRK-402 stop after 5 seconds.
 
-            # T+5s: Stop truck
-            if elapsed >= 5 and not self.scenario_executed['t5_delay']:
-                self.scenario_executed['t5_delay'] = True
-                print(f"🎬 DEMO: T+{elapsed}s - TRK-402 stopping (velocity → 0)")
-                return 0.0
+    This simulates a realistic delay for demonstration purposes. The demo
+    clock starts at start_time, or else at each truck's first reading (a
+    min reducer), and the stop is a pw.if_else on the elapsed time, so it
+    is evaluated by the engine - no Python call or mutable state per row.
 
-            # Keep stopped until arbitrage execution
-            if self.scenario_executed['t5_delay']:
-                return 0.0
+    Args:
+        gps_stream: Original GPS stream
+        start_time: Fixed demo start (unix seconds), or None
 
-            return float(velocity)
+    Returns:
+        GPS stream with the demo truck's velocity overridden
+    """
 
-        # Apply scenario modifications
-        modified_stream = gps_stream.select(
-            truck_id=pw.this.truck_id,
-            driver=pw.this.driver,
-            lat=pw.this.lat,
-            lon=pw.this.lon,
-            velocity=pw.apply(
-                apply_demo_scenario,
-                pw.this.truck_id,
-                pw.this.velocity,
-                pw.this.timestamp
-            ),
-            cargo_value=pw.this.cargo_value,
-            contract_id=pw.this.contract_id,
-            status=pw.this.status,
-            timestamp=pw.this.timestamp,
-            route=pw.this.route
+    if start_time is not None:
+        elapsed = pw.this.timestamp - start_time
+    else:
+        # First reading per truck - the start of the demo timeline
+        start_times = gps_stream.groupby(pw.this.truck_id).reduce(
+            pw.this.truck_id,
+            start_time=pw.reducers.min(pw.this.timestamp)
         )
-
-        return modified_stream
+        elapsed = pw.this.timestamp - start_times.ix_ref(pw.this.truck_id).start_time
+
+    # Apply scenario modifications
+    modified_stream = gps_stream.select(
+        truck_id=pw.this.truck_id,
+        driver=pw.this.driver,
+        lat=pw.this.lat,
+        lon=pw.this.lon,
+        velocity=pw.if_else(
+            (pw.this.truck_id == DEMO_TRUCK_ID) & (elapsed >= DEMO_STOP_AFTER),
+            0.0,
+            pw.this.velocity  # already float in the GPS schema
+        ),
+        cargo_value=pw.this.cargo_value,
+        contract_id=pw.this.contract_id,
+        status=pw.this.status,
+        timestamp=pw.this.timestamp,
+        route=pw.this.route
+    )
+
+    return modified_stream
 
 
 # Integration with main pipeline
@@ -93,5 +85,4 @@ def apply_demo_scenario(gps_stream: pw.Table, enable_demo: bool = True) -> pw.Ta
     if not enable_demo:
         return gps_stream
 
-    controller = DemoScenarioController()
-    return controller.modify_velocity_for_demo(gps_stream)
+    return modify_velocity_for_demo(gps_stream, start_time=DEMO_START_TS or None)
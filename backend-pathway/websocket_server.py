@@ -5,9 +5,243 @@ Reads Pathway output files and broadcasts to frontend via WebSocket
 """
 
 import asyncio
-import json
+import logging
+import logging.handlers
+import mmap
 import os
-from adapters.websocket_output import WebSocketBroadcaster
+import queue
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from adapters.websocket_output import (
+    ROW_DECODE_ERRORS,
+    WebSocketBroadcaster,
+    decode_truck_status,
+    install_uvloop
+)
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # Optional (Linux only) - the reader then polls once per second
+    INotify = None
+
+# Per-update messages are DEBUG (LOGLEVEL=DEBUG shows them); startup
+# banners stay on print
+logger = logging.getLogger("websocket_server")
+
+# Directory Pathway writes its JSONL outputs to
+OUTPUT_DIR = os.getenv('OUTPUT_DIR', 'output')
+TRUCK_STATUS_FILE = os.path.join(OUTPUT_DIR, 'truck_status.jsonl')
+EVENTS_FILE = os.path.join(OUTPUT_DIR, 'events.jsonl')
+ARBITRAGE_FILE = os.path.join(OUTPUT_DIR, 'arbitrage_opportunities.jsonl')
+
+# Seconds between checks of the output files when inotify is unavailable
+POLL_INTERVAL = 1.0
+
+# Seconds to wait after the first inotify event before reading, so all the
+# writes landing in that window (every output of one Pathway commit, or a
+# burst of commits) are read and broadcast together. COALESCE_MS trades
+# latency for fewer websocket sends
+WRITE_COALESCE_DELAY = int(os.getenv('COALESCE_MS', '25')) / 1000
+
+
+class OutputWatcher:
+    """
+    Wakes the output reader when Pathway writes to OUTPUT_DIR.
+
+    With inotify_simple installed the output directory is watched for
+    modified/created files and the inotify fd is registered with the event
+    loop, so the reader sleeps until a writer appends. Otherwise wait()
+    just sleeps POLL_INTERVAL, like the original polling loop.
+    """
+
+    def __init__(self, directory: str = OUTPUT_DIR):
+        self._changed = asyncio.Event()
+        self._inotify = None
+
+        if INotify is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._inotify = INotify()
+            self._inotify.add_watch(directory, flags.MODIFY | flags.CREATE | flags.MOVED_TO)
+            asyncio.get_running_loop().add_reader(self._inotify.fd, self._on_event)
+
+    @property
+    def event_driven(self) -> bool:
+        return self._inotify is not None
+
+    def _on_event(self):
+        # Drain everything queued; one wakeup covers a whole burst of writes
+        self._inotify.read(timeout=0)
+        self._changed.set()
+
+    async def wait(self):
+        """Return once the output files may have changed"""
+        if self._inotify is None:
+            await asyncio.sleep(POLL_INTERVAL)
+            return
+
+        await self._changed.wait()
+        await asyncio.sleep(WRITE_COALESCE_DELAY)
+        self._changed.clear()
+
+    def close(self):
+        if self._inotify is not None:
+            asyncio.get_running_loop().remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+
+
+# Read position in an output file: (inode, byte offset). The inode tells a
+# file the writer rotated away (to <path>.old) from the new one at path
+Cursor = Tuple[int, int]
+
+
+def file_end(path: str) -> Cursor:
+    """Cursor at the current end of path, or (0, 0) if it does not exist yet"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return 0, 0
+    return st.st_ino, st.st_size
+
+
+def _decode_lines(f, size: int, offset: int, limit: Optional[int],
+                  decode: Callable[[Any], Any], additions_only: bool = False) -> Tuple[List[Any], int]:
+    """
+    Decode the complete lines of an open file between offset and size.
+
+    Args:
+        f: File opened in binary mode
+        size: Its current size
+        offset: Where to start (the start of a line)
+        limit: Decode at most this many of the newest lines
+        decode: Line decoder
+        additions_only: Drop retraction rows ("diff": -1); they do not
+            count towards limit
+
+    Returns:
+        (decoded records, offset just past the last complete line)
+    """
+    if size <= offset:
+        return [], offset
+
+    with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+        # Complete lines only
+        end = mm.rfind(b'\n', offset, size) + 1
+        if end <= offset:
+            return [], offset
+
+        # The decoder reads the mapped bytes directly; a corrupt line
+        # is skipped, anything else propagates
+        records = []
+        with memoryview(mm) as view:
+            if limit is None:
+                start = offset
+                while start < end:
+                    newline = mm.find(b'\n', start, end)
+                    if newline > start:
+                        try:
+                            record = decode(view[start:newline])
+                        except ROW_DECODE_ERRORS:
+                            pass
+                        else:
+                            if not (additions_only and record.get('diff') == -1):
+                                records.append(record)
+                    start = newline + 1
+            else:
+                # Newest first, back from the last newline
+                stop = end - 1
+                while stop > offset and len(records) < limit:
+                    start = mm.rfind(b'\n', offset, stop) + 1 or offset
+                    if stop > start:
+                        try:
+                            record = decode(view[start:stop])
+                        except ROW_DECODE_ERRORS:
+                            pass
+                        else:
+                            if not (additions_only and record.get('diff') == -1):
+                                records.append(record)
+                    stop = start - 1
+                records.reverse()
+
+    return records, end
+
+
+def _drain_rotated(path: str, inode: int, offset: int, limit: Optional[int],
+                   decode: Callable[[Any], Any], additions_only: bool) -> List[Any]:
+    """Decode what is left of a rotated file, if <path>.old is still the file the cursor was on"""
+    try:
+        f = open(path + '.old', 'rb')
+    except FileNotFoundError:
+        return []
+
+    with f:
+        st = os.fstat(f.fileno())
+        if st.st_ino != inode:
+            return []
+        records, _ = _decode_lines(f, st.st_size, offset, limit, decode, additions_only)
+    return records
+
+
+def read_delta(path: str, cursor: Cursor, limit: Optional[int] = None,
+               decode: Callable[[Any], Any] = orjson.loads,
+               additions_only: bool = False) -> Tuple[List[Any], Cursor]:
+    """
+    Decode the JSON lines appended to a file since cursor.
+
+    The file is memory-mapped and each new line is decoded straight from
+    the page cache through a memoryview - no read() copy of the new bytes.
+    A trailing partial line (a write still in progress) is left for the
+    next call. A file that does not exist yet simply has no new records,
+    so callers need no exists()/getsize() calls of their own.
+
+    If path is a different file than last time (new inode), the writer
+    rotated the old one to <path>.old: its unread tail is decoded first,
+    then the new file from the beginning. If the file shrank in place,
+    i.e. Pathway restarted and truncated it, reading starts over.
+
+    With limit, only the last limit lines are decoded (scanning back from
+    the end); earlier new lines are skipped without being parsed.
+
+    With additions_only, Pathway's retraction rows ("diff": -1, the old
+    version of an updated row) are dropped and do not use up the limit.
+
+    decode turns one line into a record - orjson.loads gives dicts, a
+    msgspec decoder (decode_truck_status) gives typed structs.
+
+    Args:
+        path: JSONL file to tail
+        cursor: Cursor returned by the previous call (or file_end())
+        limit: Decode at most this many of the newest records
+        decode: Line decoder, called with a memoryview of the line
+        additions_only: Skip retraction rows
+
+    Returns:
+        (decoded records, cursor to pass next time)
+    """
+    inode, offset = cursor
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return [], cursor
+
+    with f:
+        st = os.fstat(f.fileno())
+        rotated = []
+        if st.st_ino != inode:
+            if inode:
+                rotated = _drain_rotated(path, inode, offset, limit, decode, additions_only)
+            offset = 0
+        elif st.st_size < offset:
+            offset = 0
+
+        records, offset = _decode_lines(f, st.st_size, offset, limit, decode, additions_only)
+
+    if rotated:
+        records = rotated + records
+        if limit is not None:
+            records = records[-limit:]
+    return records, (st.st_ino, offset)
 
 
 async def read_pathway_outputs(broadcaster: WebSocketBroadcaster):
@@ -16,102 +250,94 @@ async def read_pathway_outputs(broadcaster: WebSocketBroadcaster):
     """
     print("📖 Starting to read Pathway output files...")
 
-    last_truck_size = 0
-    last_event_size = 0
-    last_arbitrage_size = 0
+    watcher = OutputWatcher()
+    if watcher.event_driven:
+        print(f"👀 Watching {OUTPUT_DIR}/ for writes (inotify)")
+    else:
+        print(f"⏱️  Polling {OUTPUT_DIR}/ every {POLL_INTERVAL:.0f}s (install inotify_simple for event-driven reads)")
 
-    # Track initial file sizes to skip old data
-    initial_truck_size = 0
-    initial_event_size = 0
-    initial_arbitrage_size = 0
+    # Read cursor per output file. Starting at the current ends skips old
+    # data from previous runs; only records appended from now on are sent
+    cursors = {path: file_end(path) for path in (TRUCK_STATUS_FILE, EVENTS_FILE, ARBITRAGE_FILE)}
 
-    # Record initial sizes to ignore old data from previous runs
-    if os.path.exists('output/truck_status.jsonl'):
-        initial_truck_size = os.path.getsize('output/truck_status.jsonl')
-        last_truck_size = initial_truck_size
-        print(f"📊 Skipping {initial_truck_size} bytes of old truck data")
+    # Latest status row per truck, updated as rows arrive; every broadcast
+    # carries all trucks, however many updates came in since the last one.
+    # Rows are TruckStatus structs when msgspec is installed, dicts otherwise
+    latest_truck_state: Dict[str, Any] = {}
 
-    if os.path.exists('output/events.jsonl'):
-        initial_event_size = os.path.getsize('output/events.jsonl')
-        last_event_size = initial_event_size
-        print(f"🚨 Skipping {initial_event_size} bytes of old event data")
+    if cursors[TRUCK_STATUS_FILE][0]:
+        print(f"📊 Skipping {cursors[TRUCK_STATUS_FILE][1]} bytes of old truck data")
 
-    if os.path.exists('output/arbitrage_opportunities.jsonl'):
-        initial_arbitrage_size = os.path.getsize('output/arbitrage_opportunities.jsonl')
-        last_arbitrage_size = initial_arbitrage_size
-        print(f"💰 Skipping {initial_arbitrage_size} bytes of old arbitrage data")
+    if cursors[EVENTS_FILE][0]:
+        print(f"🚨 Skipping {cursors[EVENTS_FILE][1]} bytes of old event data")
 
-    while True:
-        try:
-            # Read truck status
-            if os.path.exists('output/truck_status.jsonl'):
-                current_size = os.path.getsize('output/truck_status.jsonl')
-                if current_size != last_truck_size:
-                    with open('output/truck_status.jsonl', 'r') as f:
-                        lines = f.readlines()
-                        if lines:
-                            # Get latest state for each truck
-                            trucks_by_id = {}
-                            for line in lines[-50:]:  # Last 50 updates
-                                try:
-                                    data = json.loads(line)
-                                    trucks_by_id[data['truck_id']] = data
-                                except:
-                                    pass
-
-                            truck_data = list(trucks_by_id.values())
-                            if truck_data:
-                                await broadcaster.update_from_pathway_stream(truck_data=truck_data)
-                                print(f"📊 Broadcast {len(truck_data)} trucks")
-
-                    last_truck_size = current_size
-
-            # Read events
-            if os.path.exists('output/events.jsonl'):
-                current_size = os.path.getsize('output/events.jsonl')
-                if current_size != last_event_size:
-                    with open('output/events.jsonl', 'r') as f:
-                        lines = f.readlines()
-                        if lines:
-                            # Get last 10 events
-                            event_data = []
-                            for line in lines[-10:]:
-                                try:
-                                    data = json.loads(line)
-                                    event_data.append(data)
-                                except:
-                                    pass
-
-                            if event_data:
-                                await broadcaster.update_from_pathway_stream(event_data=event_data)
-                                print(f"🚨 Broadcast {len(event_data)} events")
-
-                    last_event_size = current_size
-
-            # Read arbitrage opportunities - ONLY if file has grown (new data)
-            if os.path.exists('output/arbitrage_opportunities.jsonl'):
-                current_size = os.path.getsize('output/arbitrage_opportunities.jsonl')
-                # Only process if file has grown beyond initial size (new data added)
-                if current_size > initial_arbitrage_size and current_size != last_arbitrage_size:
-                    with open('output/arbitrage_opportunities.jsonl', 'r') as f:
-                        lines = f.readlines()
-                        if lines:
-                            # Get latest arbitrage opportunity
-                            try:
-                                arbitrage_data = json.loads(lines[-1])
-                                await broadcaster.update_from_pathway_stream(arbitrage_data=arbitrage_data)
-                                print(f"💰 Broadcast arbitrage opportunity")
-                            except:
-                                pass
-
-                    last_arbitrage_size = current_size
-
-            # Check every 1 second
-            await asyncio.sleep(1)
-
-        except Exception as e:
-            print(f"⚠️  Error reading outputs: {e}")
-            await asyncio.sleep(1)
+    if cursors[ARBITRAGE_FILE][0]:
+        print(f"💰 Skipping {cursors[ARBITRAGE_FILE][1]} bytes of old arbitrage data")
+
+    try:
+        while True:
+            try:
+                # Collect everything written since the last wakeup, then
+                # update the broadcaster once - one state_update per wakeup
+                truck_data = arbitrage_data = None
+
+                # Read the three outputs concurrently, off the event loop -
+                # the files are independent, and mapping/decoding them must
+                # not hold up websocket sends. Events: last 10 new ones;
+                # arbitrage: only the latest new one (older lines not parsed).
+                # Retractions are not new events or opportunities, so those
+                # two skip them; truck rows go through the timestamp guard
+                truck_delta, event_delta, arbitrage_delta = await asyncio.gather(
+                    asyncio.to_thread(read_delta, TRUCK_STATUS_FILE, cursors[TRUCK_STATUS_FILE], None, decode_truck_status),
+                    asyncio.to_thread(read_delta, EVENTS_FILE, cursors[EVENTS_FILE], 10, orjson.loads, True),
+                    asyncio.to_thread(read_delta, ARBITRAGE_FILE, cursors[ARBITRAGE_FILE], 1, orjson.loads, True)
+                )
+                truck_records, cursors[TRUCK_STATUS_FILE] = truck_delta
+                event_data, cursors[EVENTS_FILE] = event_delta
+                arbitrage_records, cursors[ARBITRAGE_FILE] = arbitrage_delta
+
+                # Fold the new rows into the latest state per truck; a row
+                # older than the one already held (out of order) is ignored
+                changed = False
+                for data in truck_records:
+                    truck_id = data.get('truck_id')
+                    if truck_id is None:
+                        continue
+                    current = latest_truck_state.get(truck_id)
+                    if current is None or data.get('timestamp', 0) >= current.get('timestamp', 0):
+                        latest_truck_state[truck_id] = data
+                        changed = True
+                if changed:
+                    truck_data = list(latest_truck_state.values())
+
+                if arbitrage_records:
+                    arbitrage_data = arbitrage_records[-1]
+
+                if truck_data or event_data or arbitrage_data:
+                    await broadcaster.update_from_pathway_stream(
+                        truck_data=truck_data,
+                        event_data=event_data,
+                        arbitrage_data=arbitrage_data
+                    )
+                    if logger.isEnabledFor(logging.DEBUG):
+                        if truck_data:
+                            logger.debug("📊 Broadcast %d trucks", len(truck_data))
+                        if event_data:
+                            logger.debug("🚨 Broadcast %d events", len(event_data))
+                        if arbitrage_data:
+                            logger.debug("💰 Broadcast arbitrage opportunity")
+
+                # Sleep until Pathway writes again (or the next poll)
+                await watcher.wait()
+
+            except Exception as e:
+                # Cancellation is not an Exception, so shutdown still
+                # propagates; the traceback is there at LOGLEVEL=DEBUG
+                logger.warning("⚠️  Error reading outputs: %s", e,
+                               exc_info=logger.isEnabledFor(logging.DEBUG))
+                await asyncio.sleep(1)
+    finally:
+        watcher.close()
 
 
 async def main():
@@ -126,7 +352,7 @@ async def main():
 
     # Clear old arbitrage data to prevent showing stale opportunities
     print("🧹 Clearing old arbitrage data...")
-    if os.path.exists('output/arbitrage_opportunities.jsonl'):
+    if os.path.exists(ARBITRAGE_FILE):
         # Don't delete, but we'll skip reading it until new data arrives
         print("   Old arbitrage file exists - will only show NEW opportunities")
 
@@ -137,15 +363,53 @@ async def main():
     # Create broadcaster
     broadcaster = WebSocketBroadcaster(host=host, port=port)
 
-    # Start WebSocket server and output reader concurrently
-    await asyncio.gather(
-        broadcaster.start_server(),
-        read_pathway_outputs(broadcaster)
-    )
+    # Start the output reader alongside the WebSocket server. When the
+    # server stops (Ctrl+C, or it fails to bind) the reader is cancelled
+    # and awaited, so its inotify fd is closed before the loop shuts down
+    reader = asyncio.create_task(read_pathway_outputs(broadcaster))
+    try:
+        await broadcaster.start_server()
+    finally:
+        reader.cancel()
+        try:
+            await reader
+        except asyncio.CancelledError:
+            pass
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Route logging through a queue drained by a listener thread.
+
+    Coroutines only enqueue records; the stderr write happens on the
+    listener's thread, never on the event loop. Same format as main.py.
+
+    Returns:
+        The started listener (stop it on shutdown to flush the queue)
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(
+        "[%(asctime)s]:%(levelname)s:%(message)s",
+        datefmt="%Y-%m-%dT%H:%M:%S"
+    ))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(os.getenv('LOGLEVEL', 'INFO').upper())
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    return listener
 
 
 if __name__ == "__main__":
+    install_uvloop()
+    log_listener = setup_logging()
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         print("\n\n🛑 WebSocket server stopped by user")
+    finally:
+        log_listener.stop()
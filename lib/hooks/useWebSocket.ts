@@ -14,6 +14,7 @@ interface WebSocketMessage {
     data?: WebSocketDataMessage | ArbitrageOpportunity;
     truckId?: string;
     timestamp?: string;
+    messages?: WebSocketMessage[];
 }
 
 interface WebSocketState {
@@ -209,7 +210,12 @@ export function useWebSocket(url: string = 'ws://localhost:8765') {
             ws.onmessage = (event) => {
                 try {
                     const message: WebSocketMessage = JSON.parse(event.data);
-                    handleMessage(message);
+                    // Server coalesces messages sent within one flush window into a batch
+                    if (message.type === 'batch') {
+                        (message.messages || []).forEach(handleMessage);
+                    } else {
+                        handleMessage(message);
+                    }
                 } catch (error) {
                     console.error('Failed to parse WebSocket message:', error);
                 }